@@ -1,230 +1,881 @@
 import os
+import re
+import signal
+import socket
+import asyncio
 import logging
-import json
-from datetime import datetime, timedelta, time
+import logging.handlers
+import queue
+import atexit
+import threading
+import hashlib
+import functools
+import random
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic
+from datetime import datetime, timedelta, time, timezone
+from zoneinfo import ZoneInfo
+from email.utils import parsedate_to_datetime
 from telegram import Update
 from telegram.ext import Application, MessageHandler, filters, ContextTypes, CommandHandler
-from telegram.constants import ParseMode, ChatType
-import requests
-from threading import Thread
-from flask import Flask
-import pytz
+from telegram.constants import ParseMode, ChatType, MessageLimit
+from telegram.error import TelegramError, RetryAfter, Forbidden, BadRequest
+import httpx
+import orjson
+from aiolimiter import AsyncLimiter
+import tornado.web
+import tornado.httpserver
+import tornado.netutil
 
-# Configure logging
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+try:
+    import uvloop  # optional faster event loop
+except ImportError:
+    uvloop = None
+
+try:
+    from pythonjsonlogger import jsonlogger  # optional, for LOG_FORMAT=json
+except ImportError:
+    jsonlogger = None
+
+# Environment variables
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Settings read from the environment once at startup"""
+    telegram_token: str | None
+    openrouter_api_key: str | None
+    news_api_key: str | None
+    webhook_url: str | None  # public base URL; enables webhook mode when set
+    webhook_secret: str | None
+    port: int
+    # SO_REUSEPORT, off by default: with it a second instance binds the port silently instead of
+    # failing, and in polling mode two instances then fight over getUpdates (409 Conflict)
+    reuse_port: bool
+    scheduler_lock_file: str
+    log_format: str  # "text" or "json"
+    
+    @classmethod
+    def from_env(cls):
+        return cls(
+            telegram_token=os.getenv('TELEGRAM_TOKEN'),
+            openrouter_api_key=os.getenv('OPENROUTER_API_KEY'),
+            news_api_key=os.getenv('NEWS_API_KEY'),
+            webhook_url=os.getenv('WEBHOOK_URL'),
+            webhook_secret=os.getenv('WEBHOOK_SECRET'),
+            port=int(os.getenv('PORT', 8000)),
+            reuse_port=os.getenv('REUSE_PORT', '').lower() in ('1', 'true', 'yes'),
+            scheduler_lock_file=os.getenv('SCHEDULER_LOCK_FILE', '/tmp/smoothbot.scheduler.lock'),
+            log_format=os.getenv('LOG_FORMAT', 'text').lower()
+        )
+
+CONFIG = Config.from_env()
+
+# Configure logging: handlers only enqueue records, and one listener thread writes them to stderr
+_log_handler = logging.StreamHandler()
+if CONFIG.log_format == 'json' and jsonlogger is not None:
+    _log_handler.setFormatter(jsonlogger.JsonFormatter('%(asctime)s %(name)s %(levelname)s %(message)s'))
+else:
+    _log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_LOG_QUEUE = queue.SimpleQueue()
+_LOG_LISTENER = logging.handlers.QueueListener(_LOG_QUEUE, _log_handler)
+_LOG_LISTENER.start()
+atexit.register(_LOG_LISTENER.stop)  # runs before logging's own shutdown, draining the queue
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.handlers.QueueHandler(_LOG_QUEUE)],
+    format='%(message)s',  # the listener's handler applies the real format
     level=logging.INFO
 )
 logger = logging.getLogger(__name__)
-
-# Environment variables
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-NEWS_API_KEY = os.getenv('NEWS_API_KEY')
+if CONFIG.log_format == 'json' and jsonlogger is None:
+    logger.warning("LOG_FORMAT=json needs python-json-logger; using plain text logs")
+# Skip per-record thread/process lookups that the log format never prints
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+logging.getLogger("tornado.access").setLevel(logging.WARNING)  # don't log every keep-alive ping
 
 # Bot configuration
 BOT_NAME = "smooth"
 OPENROUTER_MODEL = "deepseek/deepseek-chat:free"
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+_HEADERS_TEMPLATE = {
+    "Content-Type": "application/json",
+    "HTTP-Referer": "https://github.com/smooth-bot",
+    "X-Title": "Smooth Telegram Bot"
+}
+OPENROUTER_HEADERS = {**_HEADERS_TEMPLATE, "Authorization": f"Bearer {CONFIG.openrouter_api_key}"}
 GROUPS_FILE = "groups.json"
+IST = ZoneInfo('Asia/Kolkata')
+# Daily news: build the message at 6:59 AM IST, broadcast it at 7:00 AM IST
+NEWS_PREPARE_TIME = time(hour=6, minute=59, tzinfo=IST)
+NEWS_SEND_TIME = time(hour=7, minute=0, tzinfo=IST)
+# APScheduler drops a run that starts more than 1s late by default; allow up to an hour,
+# and collapse runs missed while the loop was busy into one. Fixed job ids plus replace_existing
+# mean a second setup_daily_news() call replaces the jobs instead of adding a second broadcast.
+NEWS_JOB_KWARGS = {'misfire_grace_time': 3600, 'coalesce': True, 'max_instances': 1, 'replace_existing': True}
+NEWS_TIME_FORMAT = "%B %d, %Y at %I:%M %p IST"
+GROUPS_SAVE_DELAY = 5  # seconds to wait after the last change before writing groups to disk
+
+# One pooled client per upstream so a burst of news fetches can't starve chat replies
+HTTP_LIMITS = httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=75)
+OPENROUTER_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=8, keepalive_expiry=75)
+AI_CACHE_SIZE = 512
+AI_CACHE_TTL = 600  # seconds
+AI_CACHE_MAX_PROMPT = 120  # characters; longer prompts are rarely repeated verbatim
+NEWS_CACHE_TTL = 900  # seconds
+NEWS_SECTION_BUCKET = 600  # seconds each formatted news section is reused for
+
+# Client-side rate limits (OpenRouter free tier: 20 req/min, NewsAPI developer: 100 req/day)
+OPENROUTER_RATE = 20 / 60  # requests per second
+OPENROUTER_BURST = 5
+NEWS_RATE = 100 / 86400
+NEWS_BURST = 12
+NEWS_DAILY_RESERVE = 3  # tokens on-demand news must leave for the morning roundup (one per section)
+DEFAULT_RETRY_AFTER = 30  # seconds
+
+# Daily broadcast stays under Telegram's 30 msg/s global limit, leaving headroom for chat replies
+BROADCAST_LIMITER = AsyncLimiter(25, 1)
+PIN_RETRY_DAYS = 7  # after a pin refused for missing rights, skip pinning there for this long
+
+# Retries for transient OpenRouter failures
+OPENROUTER_MAX_RETRIES = 2
+OPENROUTER_RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_BACKOFF = 0.5  # seconds, doubled per attempt
+MAX_RETRY_WAIT = 10  # seconds; longer Retry-After values go straight to the user
+
+# Streaming replies are edited in place at most this often (Telegram throttles edits)
+STREAM_EDIT_INTERVAL = 0.8  # seconds
+STREAM_GROUP_EDIT_INTERVAL = 3  # seconds; groups allow only ~20 messages/edits per minute
+STREAM_FINAL_ATTEMPTS = 3  # tries to deliver the full reply when flood control kicks in
+
+# Hosts send SIGKILL ~30s after SIGTERM; exit on our own terms before that
+SHUTDOWN_TIMEOUT = 25  # seconds
+
+NEWS_SEPARATOR = "━━━━━━━━━━━━━━━━━━━━━\n\n"
+
+# MarkdownV2 escaping: every special character in text, and ')' / '\\' inside link URLs
+_MD_ESCAPE = str.maketrans({c: '\\' + c for c in '\\_*[]()~`>#+-=|{}.!'})
+_MD_URL_ESCAPE = str.maketrans({c: '\\' + c for c in '\\)'})
+
+# Static parts of the news message, already escaped for MarkdownV2
+_NEWS_HEADER = "🌅 *GOOD MORNING\\! DAILY NEWS ROUNDUP* 🌅\n📅 _{}_\n" + NEWS_SEPARATOR
 
 # Character persona
 PERSONA = """You are Smooth, a chill and friendly AI assistant with a laid-back personality. 
 You're helpful, witty, and always keep conversations engaging. You speak casually but intelligently, 
 like a knowledgeable friend who's always got your back. You love using emojis to express yourself 
 and keep things fun! 😎"""
+_SYSTEM_MSG = {"role": "system", "content": PERSONA}  # shared across calls; never mutate
 
-# Flask app for keep-alive
-app = Flask(__name__)
+# Message matching
+NAME_RE = re.compile(re.escape(BOT_NAME), re.IGNORECASE)
+NEWS_RE = re.compile(r"\b(?:news|headlines|updates|latest news|what'?s happening)\b", re.IGNORECASE)
 
-@app.route('/')
-def home():
-    return "Bot is alive! 🤖✨"
+# Web server for keep-alive pings and (in webhook mode) Telegram updates.
+# It runs on the bot's own event loop, so no extra thread or WSGI stack is needed.
+class HomeHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.write("Bot is alive! 🤖✨")
 
-@app.route('/health')
-def health():
-    return {"status": "healthy", "bot": "smooth", "groups": len(load_groups())}
+class HealthHandler(tornado.web.RequestHandler):
+    def get(self):
+        # orjson instead of tornado's stdlib json encoding of dicts
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.write(orjson.dumps({"status": "healthy", "bot": "smooth", "groups": len(load_groups())}))
 
-def run_flask():
-    """Run Flask server in a separate thread"""
-    port = int(os.getenv('PORT', 8000))
-    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
+class WebhookHandler(tornado.web.RequestHandler):
+    def initialize(self, bot_app):
+        self.bot_app = bot_app
+    
+    async def post(self):
+        if CONFIG.webhook_secret and self.request.headers.get("X-Telegram-Bot-Api-Secret-Token") != CONFIG.webhook_secret:
+            raise tornado.web.HTTPError(403)
+        try:
+            payload = orjson.loads(self.request.body)
+        except orjson.JSONDecodeError:
+            raise tornado.web.HTTPError(400)
+        if not isinstance(payload, dict):
+            raise tornado.web.HTTPError(400)
+        try:
+            update = Update.de_json(payload, self.bot_app.bot)
+        except (KeyError, TypeError, ValueError):  # an object, but not a Telegram update
+            raise tornado.web.HTTPError(400)
+        if update is None:  # de_json maps an empty object to None
+            raise tornado.web.HTTPError(400)
+        await self.bot_app.update_queue.put(update)
+
+def start_web_server(application: Application):
+    """Serve / and /health, plus the webhook path when webhooks are enabled"""
+    routes = [(r"/", HomeHandler), (r"/health", HealthHandler)]
+    if CONFIG.webhook_url:
+        routes.append((f"/{re.escape(CONFIG.telegram_token)}", WebhookHandler, {"bot_app": application}))
+    
+    # Opt-in SO_REUSEPORT lets an overlapping webhook deploy bind the port while the old process drains
+    sockets = tornado.netutil.bind_sockets(
+        CONFIG.port,
+        address='0.0.0.0',
+        reuse_port=CONFIG.reuse_port and hasattr(socket, 'SO_REUSEPORT')
+    )
+    if hasattr(socket, 'TCP_DEFER_ACCEPT'):  # Linux: wake up only once the request has arrived
+        for sock in sockets:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_DEFER_ACCEPT, 1)
+    
+    server = tornado.httpserver.HTTPServer(tornado.web.Application(routes))
+    server.add_sockets(sockets)
+    logger.info("Web server started on port %d", CONFIG.port)
+    return server
 
 # Group Management
-def load_groups():
-    """Load saved groups from file"""
+_GROUPS = None  # in-memory copy of GROUPS_FILE, loaded on first use
+_GROUPS_DIRTY = False  # True while in-memory changes haven't been written yet
+_SAVE_QUEUE = asyncio.Queue()  # one item per change; the saver task coalesces them
+_SAVER_TASK = None
+_SAVE_IN_FLIGHT = None  # the worker-thread write currently running, if any
+_SAVE_LOCK = threading.Lock()  # a worker-thread write and the shutdown flush must not overlap
+
+def _load_groups_from_disk():
+    """Read saved groups from file"""
     try:
         if os.path.exists(GROUPS_FILE):
-            with open(GROUPS_FILE, 'r') as f:
-                return json.load(f)
+            with open(GROUPS_FILE, 'rb') as f:
+                return orjson.loads(f.read())
         return {}
     except Exception as e:
-        logger.error(f"Error loading groups: {e}")
+        logger.error("Error loading groups: %s", e)
         return {}
 
+def load_groups():
+    """Return the saved groups, reading the file only the first time"""
+    global _GROUPS
+    if _GROUPS is None:
+        _GROUPS = _load_groups_from_disk()
+    return _GROUPS
+
 def save_groups(groups):
-    """Save groups to file"""
+    """Save groups to file atomically (write a temp file, then rename over the old one)"""
+    tmp_file = GROUPS_FILE + '.tmp'
     try:
-        with open(GROUPS_FILE, 'w') as f:
-            json.dump(groups, f, indent=2)
+        with _SAVE_LOCK:
+            data = orjson.dumps(groups, option=orjson.OPT_INDENT_2)
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, GROUPS_FILE)
     except Exception as e:
-        logger.error(f"Error saving groups: {e}")
+        logger.error("Error saving groups: %s", e)
+
+def _take_pending_groups():
+    """Return a snapshot of the groups if there are unsaved changes, else None"""
+    global _GROUPS_DIRTY
+    while not _SAVE_QUEUE.empty():
+        _SAVE_QUEUE.get_nowait()
+    if not _GROUPS_DIRTY:
+        return None
+    _GROUPS_DIRTY = False
+    return dict(_GROUPS)
+
+def flush_groups():
+    """Write pending group changes to disk now"""
+    snapshot = _take_pending_groups()
+    if snapshot is not None:
+        save_groups(snapshot)
+
+def _mark_groups_dirty():
+    """Queue a background save of the groups"""
+    global _GROUPS_DIRTY
+    _GROUPS_DIRTY = True
+    _SAVE_QUEUE.put_nowait(None)
+
+async def write_pending_groups():
+    """Write unsaved group changes on a worker thread, after any write already running"""
+    global _SAVE_IN_FLIGHT
+    # Writes are chained so an older snapshot can never land on disk after a newer one
+    while _SAVE_IN_FLIGHT is not None:
+        await asyncio.shield(_SAVE_IN_FLIGHT)
+    snapshot = _take_pending_groups()
+    if snapshot is None:
+        return
+    # Disk I/O runs on a worker thread so slow storage can't stall the event loop.
+    # Shielded: cancelling the caller must not abandon a write that is still running.
+    in_flight = _SAVE_IN_FLIGHT = asyncio.ensure_future(asyncio.to_thread(save_groups, snapshot))
+    await asyncio.shield(in_flight)
+    if _SAVE_IN_FLIGHT is in_flight:
+        _SAVE_IN_FLIGHT = None
+
+async def _group_saver():
+    """Background task: wait for changes, let a burst settle, then write once"""
+    while True:
+        await _SAVE_QUEUE.get()
+        # Debounce: every further change restarts the wait
+        while True:
+            try:
+                await asyncio.wait_for(_SAVE_QUEUE.get(), GROUPS_SAVE_DELAY)
+            except asyncio.TimeoutError:
+                break
+        await write_pending_groups()
+
+def start_group_saver():
+    """Start the background groups writer on the running event loop"""
+    global _SAVER_TASK
+    _SAVER_TASK = asyncio.create_task(_group_saver())
+
+async def stop_group_saver():
+    """Stop the background writer and save anything still pending"""
+    global _SAVER_TASK, _SAVE_IN_FLIGHT
+    if _SAVER_TASK is not None:
+        _SAVER_TASK.cancel()
+        try:
+            await _SAVER_TASK
+        except asyncio.CancelledError:
+            pass
+        _SAVER_TASK = None
+    # Let an older snapshot finish writing first so the flush below can't be overwritten by it
+    if _SAVE_IN_FLIGHT is not None:
+        await _SAVE_IN_FLIGHT
+        _SAVE_IN_FLIGHT = None
+    flush_groups()
 
 def add_group(chat_id, chat_title):
     """Add a group to the saved list"""
     groups = load_groups()
-    groups[str(chat_id)] = {
+    key = str(chat_id)
+    cached = groups.get(key)
+    if cached is not None:
+        # Common case: known group, nothing changed
+        if cached.get('title') == chat_title:
+            return
+        cached['title'] = chat_title
+        _mark_groups_dirty()
+        logger.info("Group renamed: %s (%s)", chat_title, chat_id)
+        return
+    
+    groups[key] = {
         "title": chat_title,
         "added_at": datetime.now().isoformat()
     }
-    save_groups(groups)
-    logger.info(f"Group added: {chat_title} ({chat_id})")
+    _mark_groups_dirty()
+    logger.info("Group added: %s (%s)", chat_title, chat_id)
+
+# Response caching
+class TTLCache:
+    """Small LRU cache whose entries expire after a fixed TTL"""
+    
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+    
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key, value):
+        self._data[key] = (monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def clear(self):
+        self._data.clear()
+
+AI_CACHE = TTLCache(AI_CACHE_SIZE, AI_CACHE_TTL)
 
-def call_openrouter(messages, image_url=None):
-    """Call OpenRouter API with error handling"""
+# Rate limiting
+class TokenBucket:
+    """Token bucket that admits calls locally instead of waiting for a 429"""
+    
+    def __init__(self, rate_per_sec, burst):
+        self.rate = rate_per_sec
+        self.burst = burst
+        self.tokens = burst
+        self.updated = monotonic()
+        self.blocked_until = 0.0
+    
+    def try_acquire(self, reserve=0):
+        """Take a token, leaving at least `reserve` tokens for other callers"""
+        now = monotonic()
+        if now < self.blocked_until:
+            return False
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1 + reserve:
+            return False
+        self.tokens -= 1
+        return True
+    
+    def penalize(self, seconds):
+        """Refuse all calls for the given number of seconds (e.g. after a 429)"""
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, monotonic() + seconds)
+
+OPENROUTER_BUCKET = TokenBucket(OPENROUTER_RATE, OPENROUTER_BURST)
+NEWS_BUCKET = TokenBucket(NEWS_RATE, NEWS_BURST)
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds"""
+    if not value:
+        return default
     try:
-        last_message = messages[-1].copy()
-        
-        if image_url:
-            last_message["content"] = [
-                {"type": "text", "text": messages[-1]["content"]},
-                {"type": "image_url", "image_url": {"url": image_url}}
-            ]
-            messages[-1] = last_message
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+def _ttl_cache(ttl_seconds, maxsize=128):
+    """Memoize an async function's non-empty results for ttl_seconds"""
+    def decorator(func):
+        cache = TTLCache(maxsize, ttl_seconds)
         
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://github.com/smooth-bot",
-            "X-Title": "Smooth Telegram Bot"
-        }
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+            result = await func(*args, **kwargs)
+            # Failures come back empty; don't let them poison the cache
+            if result:
+                cache.set(key, result)
+            return result
         
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+def openrouter_cache_key(messages, image_url=None):
+    """Hash the model and conversation into a cache key, or None if it shouldn't be cached"""
+    # Image answers depend on the image itself, and long prompts almost never repeat
+    if image_url or len(messages[-1]["content"]) >= AI_CACHE_MAX_PROMPT:
+        return None
+    payload = orjson.dumps({"model": OPENROUTER_MODEL, "messages": messages}, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+def with_image(messages, image_url):
+    """Return messages with the image attached to the last one (caller's list is untouched)"""
+    if not image_url:
+        return messages
+    last = messages[-1]
+    return messages[:-1] + [{**last, "content": [
+        {"type": "text", "text": last["content"]},
+        {"type": "image_url", "image_url": {"url": image_url}}
+    ]}]
+
+async def call_openrouter(http, messages, image_url=None, acquired=False):
+    """Call OpenRouter API with error handling (acquired: the caller already took a bucket token)"""
+    cache_key = openrouter_cache_key(messages, image_url)
+    if cache_key:
+        cached = AI_CACHE.get(cache_key)
+        if cached is not None:
+            logger.info("OpenRouter cache hit")
+            return cached, False
+    
+    if not acquired and not OPENROUTER_BUCKET.try_acquire():
+        logger.warning("OpenRouter client-side rate limit reached")
+        return None, True
+    
+    try:
         data = {
             "model": OPENROUTER_MODEL,
-            "messages": messages
+            "messages": with_image(messages, image_url)
         }
         
-        response = requests.post(OPENROUTER_URL, headers=headers, json=data, timeout=30)
+        body = orjson.dumps(data)
+        for attempt in range(OPENROUTER_MAX_RETRIES + 1):
+            response = await http.post(OPENROUTER_URL, content=body, timeout=30)
+            if response.status_code not in OPENROUTER_RETRY_STATUSES or attempt == OPENROUTER_MAX_RETRIES:
+                break
+            
+            # Exponential backoff with jitter, honoring Retry-After when the server sends one
+            delay = parse_retry_after(response.headers.get("Retry-After"), default=RETRY_BACKOFF * 2 ** attempt)
+            if delay > MAX_RETRY_WAIT or not OPENROUTER_BUCKET.try_acquire():
+                break
+            logger.warning("OpenRouter returned %s, retrying in %.1fs", response.status_code, delay)
+            await asyncio.sleep(delay + random.uniform(0, 0.5))
         
         if response.status_code == 429:
             logger.warning("OpenRouter rate limit hit")
+            OPENROUTER_BUCKET.penalize(parse_retry_after(response.headers.get("Retry-After")))
             return None, True
         
         response.raise_for_status()
-        result = response.json()
-        return result['choices'][0]['message']['content'], False
+        result = orjson.loads(response.content)
+        reply = result['choices'][0]['message']['content']
+        if cache_key and reply:
+            AI_CACHE.set(cache_key, reply)
+        return reply, False
         
-    except requests.exceptions.RequestException as e:
-        logger.error(f"OpenRouter API error: {e}")
+    except (httpx.HTTPError, orjson.JSONDecodeError) as e:
+        logger.error("OpenRouter API error: %s", e)
         return None, False
 
-def fetch_news_newsapi(query, hours=24):
-    """Fetch news from NewsAPI"""
+def split_reply(text, start=0):
+    """Return where the Telegram message holding text[start:] must end, cutting at a line or word break"""
+    end = start + MessageLimit.MAX_TEXT_LENGTH
+    if len(text) <= end:
+        return len(text)
+    for sep in ("\n", " "):
+        cut = text.rfind(sep, start + MessageLimit.MAX_TEXT_LENGTH // 2, end)
+        if cut != -1:
+            return cut + 1
+    return end
+
+async def stream_openrouter_reply(message, http, messages, image_url=None):
+    """Stream an OpenRouter reply into Telegram, editing it as tokens arrive.
+    
+    Returns (answered, acquired). answered is True once the user has been answered; otherwise
+    the caller should fall back to call_openrouter, passing acquired so the OpenRouter token
+    this attempt already took isn't charged twice.
+    """
+    cache_key = openrouter_cache_key(messages, image_url)
+    if cache_key:
+        cached = AI_CACHE.get(cache_key)
+        if cached is not None:
+            logger.info("OpenRouter cache hit")
+            start = 0
+            while start < len(cached):
+                end = split_reply(cached, start)
+                await message.reply_text(cached[start:end])
+                start = end
+            return True, False
+    
+    if not OPENROUTER_BUCKET.try_acquire():
+        return False, False
+    
+    data = {
+        "model": OPENROUTER_MODEL,
+        "messages": with_image(messages, image_url),
+        "stream": True
+    }
+    
+    text = ""
+    offset = 0  # where the part shown in the current Telegram message starts
+    shown = ""
+    sent = None
+    answered = False
+    delivered = True  # every finished part reached Telegram in full
+    last_edit = 0.0
+    complete = False
+    throttled = False  # flood control hit: stop intermediate edits, only deliver the final text
+    edit_interval = STREAM_EDIT_INTERVAL if message.chat.type == ChatType.PRIVATE else STREAM_GROUP_EDIT_INTERVAL
+    try:
+        async with http.stream("POST", OPENROUTER_URL, content=orjson.dumps(data), timeout=30) as response:
+            if response.status_code != 200:
+                if response.status_code == 429:
+                    OPENROUTER_BUCKET.penalize(parse_retry_after(response.headers.get("Retry-After")))
+                logger.warning("OpenRouter stream returned %s, falling back", response.status_code)
+                return False, True
+            
+            # Server-sent events: "data: {...}" frames, ": comment" keep-alives, "data: [DONE]" at the end
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                payload = line[6:]
+                if payload == "[DONE]":
+                    complete = True
+                    break
+                choices = orjson.loads(payload).get("choices") or [{}]
+                text += choices[0].get("delta", {}).get("content") or ""
+                
+                # Past Telegram's length limit: finish the current message and continue in a new one
+                while split_reply(text, offset) < len(text):
+                    cut = split_reply(text, offset)
+                    part = text[offset:cut]
+                    ok = part == shown or await _finish_streamed_reply(message, sent, part)
+                    answered = answered or ok or sent is not None
+                    delivered = delivered and ok
+                    offset, sent, shown = cut, None, ""
+                
+                current = text[offset:]
+                if throttled or not current.strip() or monotonic() - last_edit < edit_interval:
+                    continue
+                try:
+                    if sent is None:
+                        sent = await message.reply_text(current)
+                    elif current != shown:
+                        await sent.edit_text(current)
+                    shown = current
+                except RetryAfter as e:
+                    logger.warning("Flood control while streaming, pausing edits: %s", e)
+                    throttled = True
+                except TelegramError as e:
+                    logger.warning("Could not update streamed reply: %s", e)
+                last_edit = monotonic()
+    except (httpx.HTTPError, orjson.JSONDecodeError) as e:
+        logger.error("OpenRouter stream error: %s", e)
+        if not answered and sent is None:
+            return False, True
+    
+    current = text[offset:]
+    if current.strip() and current != shown:
+        ok = await _finish_streamed_reply(message, sent, current)
+        answered = answered or ok
+        delivered = delivered and ok
+    if not (answered or sent is not None):
+        return False, True
+    
+    # Don't cache a reply that was cut off mid-stream or never fully shown
+    if cache_key and complete and delivered:
+        AI_CACHE.set(cache_key, text)
+    return True, True
+
+async def _finish_streamed_reply(message, sent, text):
+    """Show the full streamed text, waiting out flood control; True once it was delivered"""
+    for _ in range(STREAM_FINAL_ATTEMPTS):
+        try:
+            if sent is None:
+                await message.reply_text(text)
+            else:
+                await sent.edit_text(text)
+            return True
+        except RetryAfter as e:
+            logger.warning("Flood control on streamed reply, retrying in %ss", e.retry_after)
+            await asyncio.sleep(e.retry_after)
+        except TelegramError as e:
+            logger.warning("Could not finish streamed reply: %s", e)
+            return False
+    return False
+
+class NewsThrottled(Exception):
+    """An on-demand news fetch was refused to keep NewsAPI quota for the daily roundup"""
+
+@_ttl_cache(NEWS_CACHE_TTL)
+async def fetch_news_newsapi(http, query, hours=24, reserve=0):
+    """Fetch news from NewsAPI; with a reserve, raise NewsThrottled instead of dipping into it"""
+    if not NEWS_BUCKET.try_acquire(reserve):
+        if reserve:
+            raise NewsThrottled(query)
+        logger.warning("NewsAPI client-side rate limit reached, skipping query '%s'", query)
+        return []
+    
     try:
         from_time = (datetime.now() - timedelta(hours=hours)).isoformat()
         
         url = "https://newsapi.org/v2/everything"
         params = {
             "q": query,
-            "apiKey": NEWS_API_KEY,
+            "apiKey": CONFIG.news_api_key,
             "language": "en",
             "sortBy": "publishedAt",
             "pageSize": 5,
             "from": from_time
         }
         
-        response = requests.get(url, params=params, timeout=10)
+        response = await http.get(url, params=params, timeout=10)
+        if response.status_code == 429:
+            NEWS_BUCKET.penalize(parse_retry_after(response.headers.get("Retry-After")))
         response.raise_for_status()
-        articles = response.json().get('articles', [])
+        articles = orjson.loads(response.content).get('articles', [])
         
         return articles[:5]
     except Exception as e:
-        logger.error(f"NewsAPI error for query '{query}': {e}")
+        logger.error("NewsAPI error for query '%s': %s", query, e)
         return []
 
-def format_news_section(title, emoji, articles):
-    """Format a news section"""
-    section = f"{emoji} *{title}* {emoji}\n\n"
+def format_news_section(parts, title, emoji, articles):
+    """Format a news section, appending its pieces to parts"""
+    parts.append(f"{emoji} *{title}* {emoji}\n\n")
     
     if articles:
         for i, article in enumerate(articles, 1):
-            title_text = article.get('title', 'No title')
-            title_text = title_text.replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
-            url = article.get('url', '')
-            source = article.get('source', {}).get('name', 'Unknown')
+            title_text = article.get('title') or 'No title'
+            url = (article.get('url') or '').translate(_MD_URL_ESCAPE)
+            source = ((article.get('source') or {}).get('name') or 'Unknown').translate(_MD_ESCAPE)
             
+            # Truncate before escaping so an escape sequence is never cut in half
             if len(title_text) > 100:
                 title_text = title_text[:97] + "..."
+            title_text = title_text.translate(_MD_ESCAPE)
             
-            section += f"{i}\\. *{source}*\n   {title_text}\n   🔗 [Read more]({url})\n\n"
+            parts.append(f"{i}\\. *{source}*\n   {title_text}\n   🔗 [Read more]({url})\n\n")
     else:
-        section += "No recent news available 📭\n\n"
-    
-    return section
+        parts.append("No recent news available 📭\n\n")
 
-def format_news_message():
-    """Format news message with emojis"""
-    ist = pytz.timezone('Asia/Kolkata')
-    current_time = datetime.now(ist).strftime("%B %d, %Y at %I:%M %p IST")
+_SECTION_CACHE = {}  # (query, time bucket) -> formatted section
+
+async def fetch_news_section(http, query, title, emoji, reserve=0):
+    """Fetch and format one news section, reusing the formatted text within a time bucket.
     
-    message = f"🌅 *GOOD MORNING\\! DAILY NEWS ROUNDUP* 🌅\n"
-    message += f"📅 _{current_time}_\n"
-    message += "━━━━━━━━━━━━━━━━━━━━━\n\n"
+    Returns (section, has_articles).
+    """
+    key = (query, int(monotonic()) // NEWS_SECTION_BUCKET)
+    section = _SECTION_CACHE.get(key)
+    if section is not None:
+        return section, True
     
-    # Fetch news
-    crypto_articles = fetch_news_newsapi("cryptocurrency OR bitcoin OR ethereum OR crypto")
-    india_articles = fetch_news_newsapi("India")
-    world_articles = fetch_news_newsapi("world OR international OR global NOT India NOT crypto")
+    articles = await fetch_news_newsapi(http, query, reserve=reserve)
+    parts = []
+    format_news_section(parts, title, emoji, articles)
+    section = "".join(parts)
     
-    # Format sections
-    message += format_news_section("CRYPTO NEWS", "💰", crypto_articles)
-    message += "━━━━━━━━━━━━━━━━━━━━━\n\n"
+    # Only keep real results, and drop sections from earlier buckets
+    if articles:
+        for stale_key in [k for k in _SECTION_CACHE if k[1] != key[1]]:
+            del _SECTION_CACHE[stale_key]
+        _SECTION_CACHE[key] = section
+    return section, bool(articles)
+
+def format_news_header():
+    """The news header, stamped with the current IST time"""
+    current_time = datetime.now(IST).strftime(NEWS_TIME_FORMAT)
+    return _NEWS_HEADER.format(current_time.translate(_MD_ESCAPE))
+
+async def format_news_message(http, reserve=0):
+    """Format news message with emojis"""
+    body, _ = await format_news_body(http, reserve)
+    return format_news_header() + body
+
+async def format_news_body(http, reserve=0):
+    """Format the news sections and footer (everything below the timestamped header).
     
-    message += format_news_section("INDIA NEWS", "🇮🇳", india_articles)
-    message += "━━━━━━━━━━━━━━━━━━━━━\n\n"
+    Returns (body, has_news); has_news is False when every section came back empty.
+    """
+    parts = []
     
-    message += format_news_section("WORLD NEWS", "🌍", world_articles)
-    message += "━━━━━━━━━━━━━━━━━━━━━\n\n"
+    # Fetch and format the sections (all three queries in parallel)
+    sections = await asyncio.gather(
+        fetch_news_section(http, "cryptocurrency OR bitcoin OR ethereum OR crypto", "CRYPTO NEWS", "💰", reserve),
+        fetch_news_section(http, "India", "INDIA NEWS", "🇮🇳", reserve),
+        fetch_news_section(http, "world OR international OR global NOT India NOT crypto", "WORLD NEWS", "🌍", reserve)
+    )
+    for section, _ in sections:
+        parts.append(section)
+        parts.append(NEWS_SEPARATOR)
     
-    message += "_Stay informed, stay smooth\\!_ ✨"
+    parts.append("_Stay informed, stay smooth\\!_ ✨")
     
-    return message
+    return "".join(parts), any(has_articles for _, has_articles in sections)
+
+async def prepare_daily_news(context: ContextTypes.DEFAULT_TYPE):
+    """Build today's news sections once and keep them in bot_data for the broadcast"""
+    if not load_groups() or not acquire_scheduler_lock():
+        return
+    
+    today = datetime.now(IST).date()
+    body, has_news = await format_news_body(context.bot_data['http'])
+    if not has_news:
+        # Leave daily_news unset so send_daily_news fetches again at send time
+        logger.warning("No news available while preparing the daily message")
+        return
+    context.bot_data['daily_news'] = (today, body)
+    logger.info("Daily news message prepared")
+
+async def get_daily_news(context: ContextTypes.DEFAULT_TYPE):
+    """Return today's news message, building the sections if the prepare job didn't run"""
+    today = datetime.now(IST).date()
+    date, body = context.bot_data.get('daily_news', (None, None))
+    if date != today:
+        body, has_news = await format_news_body(context.bot_data['http'])
+        if has_news:  # an all-empty body (outage, 429, empty bucket) isn't kept for the day
+            context.bot_data['daily_news'] = (today, body)
+    # Stamp the header when sending, not when the sections were prepared
+    return format_news_header() + body
 
 async def send_daily_news(context: ContextTypes.DEFAULT_TYPE):
     """Send daily news to all registered groups"""
+    # Several bot processes on one host (e.g. overlapping deploys) must not all broadcast
+    if not acquire_scheduler_lock():
+        logger.info("Daily news is broadcast by another process; skipping")
+        return
+    
     groups = load_groups()
     
     if not groups:
         logger.warning("No groups registered for daily news")
         return
     
-    logger.info(f"Sending daily news to {len(groups)} groups")
-    news_message = format_news_message()
+    logger.info("Sending daily news to %d groups", len(groups))
+    news_message = await get_daily_news(context)
     
-    for chat_id_str, group_info in groups.items():
-        try:
-            chat_id = int(chat_id_str)
-            sent_message = await context.bot.send_message(
+    # Fan out to all groups at once; the limiter paces the actual API calls
+    await asyncio.gather(*(
+        send_news_to_group(context.bot, chat_id_str, group_info, news_message)
+        for chat_id_str, group_info in groups.items()
+    ))
+    # Persist news_sent_on right away instead of after the saver's debounce,
+    # so a crash just after the broadcast can't lead to sending it again
+    await write_pending_groups()
+
+def is_pin_permission_error(error):
+    """True if Telegram refused the pin because the bot lacks the rights for it"""
+    if isinstance(error, Forbidden):
+        return True
+    return isinstance(error, BadRequest) and any(
+        reason in error.message.lower() for reason in ("not enough rights", "admin_required")
+    )
+
+async def send_news_to_group(bot, chat_id_str, group_info, news_message):
+    """Send (and try to pin) the news message in one group"""
+    today = datetime.now(IST).date()
+    # At most one broadcast per group per IST day, even if the job is re-run after a restart
+    if group_info.get('news_sent_on') == today.isoformat():
+        logger.info("News already sent today to %s (%s)", group_info['title'], chat_id_str)
+        return
+    
+    try:
+        chat_id = int(chat_id_str)
+        async with BROADCAST_LIMITER:
+            sent_message = await bot.send_message(
                 chat_id=chat_id,
                 text=news_message,
                 parse_mode=ParseMode.MARKDOWN_V2,
                 disable_web_page_preview=True
             )
-            
-            # Try to pin
-            try:
-                await context.bot.pin_chat_message(
+        group_info['news_sent_on'] = today.isoformat()
+        _mark_groups_dirty()
+        
+        # Skip the pin request in groups where it recently failed
+        pin_failed_on = group_info.get('pin_failed_on')
+        if pin_failed_on and today - datetime.fromisoformat(pin_failed_on).date() < timedelta(days=PIN_RETRY_DAYS):
+            logger.info("News sent (pinning skipped) to %s (%s)", group_info['title'], chat_id)
+            return
+        
+        # Try to pin
+        try:
+            async with BROADCAST_LIMITER:
+                await bot.pin_chat_message(
                     chat_id=chat_id,
                     message_id=sent_message.message_id,
                     disable_notification=False
                 )
-                logger.info(f"News sent and pinned to {group_info['title']} ({chat_id})")
-            except Exception as pin_error:
-                logger.warning(f"Could not pin in {group_info['title']}: {pin_error}")
-                logger.info(f"News sent (not pinned) to {group_info['title']} ({chat_id})")
-                
-        except Exception as e:
-            logger.error(f"Error sending news to {chat_id_str}: {e}")
+            if pin_failed_on:
+                del group_info['pin_failed_on']
+                _mark_groups_dirty()
+            logger.info("News sent and pinned to %s (%s)", group_info['title'], chat_id)
+        except Exception as pin_error:
+            # Only a missing right pauses pinning; flood control or network errors retry tomorrow
+            if is_pin_permission_error(pin_error):
+                group_info['pin_failed_on'] = today.isoformat()
+                _mark_groups_dirty()
+            logger.warning("Could not pin in %s: %s", group_info['title'], pin_error)
+            logger.info("News sent (not pinned) to %s (%s)", group_info['title'], chat_id)
+            
+    except Exception as e:
+        logger.error("Error sending news to %s: %s", chat_id_str, e)
+
+def get_mention_pattern(context: ContextTypes.DEFAULT_TYPE):
+    """Compile (once) the regex matching the bot's name or @username"""
+    pattern = context.bot_data.get('mention_re')
+    if pattern is None:
+        pattern = re.compile(
+            rf"\b{re.escape(BOT_NAME)}\b|@{re.escape(context.bot.username)}\b",
+            re.IGNORECASE
+        )
+        context.bot_data['mention_re'] = pattern
+    return pattern
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle incoming messages"""
@@ -238,38 +889,47 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         add_group(chat.id, chat.title)
     
     message_text = update.message.text or update.message.caption or ""
-    bot_username = context.bot.username
+    reply_to = update.message.reply_to_message
+    is_reply_to_bot = bool(reply_to and reply_to.from_user and reply_to.from_user.id == context.bot.id)
+    
+    # Cheap pre-filters: a mention needs the name's first letter or an '@' somewhere,
+    # and then the name or @username as a substring, before the word-boundary regex runs
+    if not is_reply_to_bot:
+        initial = BOT_NAME[0]
+        if initial not in message_text and initial.upper() not in message_text and '@' not in message_text:
+            return
+        low = message_text.casefold()
+        if BOT_NAME not in low and f"@{context.bot.username.casefold()}" not in low:
+            return
     
     # Check if bot is mentioned
-    is_mentioned = (
-        BOT_NAME.lower() in message_text.lower() or
-        f"@{bot_username}".lower() in message_text.lower() or
-        (update.message.reply_to_message and 
-         update.message.reply_to_message.from_user.id == context.bot.id)
-    )
+    is_mentioned = is_reply_to_bot or get_mention_pattern(context).search(message_text)
     
     if not is_mentioned:
         return
     
-    logger.info(f"Bot mentioned by user {update.message.from_user.id}: {message_text[:50]}")
+    logger.info("Bot mentioned by user %s: %.50s", update.message.from_user.id, message_text)
     
     # Check if user is asking for news
-    news_keywords = ['news', 'headlines', 'updates', 'latest news', 'whats happening', "what's happening"]
-    is_news_request = any(keyword in message_text.lower() for keyword in news_keywords)
+    is_news_request = NEWS_RE.search(message_text)
     
     if is_news_request:
         await update.message.reply_text("Let me fetch the latest news for you! 🔍📰")
         
         try:
-            news_message = format_news_message()
+            # On-demand requests may not use up the quota the 7 AM roundup needs
+            news_message = await format_news_message(context.bot_data['http'], reserve=NEWS_DAILY_RESERVE)
             await update.message.reply_text(
                 news_message,
                 parse_mode=ParseMode.MARKDOWN_V2,
                 disable_web_page_preview=True
             )
             logger.info("News sent successfully")
+        except NewsThrottled:
+            logger.warning("On-demand news throttled to keep quota for the daily roundup")
+            await update.message.reply_text("I've checked the news a lot lately 😅 Try again in a bit, or catch the 7 AM roundup!")
         except Exception as e:
-            logger.error(f"Error sending news: {e}")
+            logger.error("Error sending news: %s", e)
             await update.message.reply_text("Oops! Had trouble fetching news 😅 Try again in a moment?")
         return
     
@@ -282,21 +942,23 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             image_url = file.file_path
             if not message_text or BOT_NAME.lower() == message_text.lower():
                 message_text = "What's in this image? Describe it for me."
-            logger.info(f"Image received with URL: {image_url}")
+            logger.info("Image received with URL: %s", image_url)
         except Exception as e:
-            logger.error(f"Error processing image: {e}")
+            logger.error("Error processing image: %s", e)
     
     # Prepare messages for OpenRouter
-    messages = [
-        {"role": "system", "content": PERSONA},
-        {"role": "user", "content": message_text}
-    ]
+    messages = [_SYSTEM_MSG, {"role": "user", "content": message_text}]
     
     # Show typing indicator
     await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
     
-    # Call OpenRouter
-    response, rate_limited = call_openrouter(messages, image_url)
+    # Stream the reply from OpenRouter, falling back to a single non-streaming call
+    http = context.bot_data['openrouter']
+    answered, acquired = await stream_openrouter_reply(update.message, http, messages, image_url)
+    if answered:
+        return
+    
+    response, rate_limited = await call_openrouter(http, messages, image_url, acquired=acquired)
     
     if rate_limited:
         await update.message.reply_text("Bit exhausted 😩 right now try again shortly")
@@ -309,7 +971,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def cmd_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show registered groups (admin command)"""
-    if BOT_NAME.lower() not in update.message.text.lower():
+    if not NAME_RE.search(update.message.text):
         return
     
     groups = load_groups()
@@ -324,64 +986,195 @@ async def cmd_groups(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
 
+async def cmd_clearcache(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Drop cached news and AI replies (admin command)"""
+    if not NAME_RE.search(update.message.text):
+        return
+    
+    fetch_news_newsapi.cache.clear()
+    _SECTION_CACHE.clear()
+    AI_CACHE.clear()
+    context.bot_data.pop('daily_news', None)
+    logger.info("Caches cleared by user %s", update.message.from_user.id)
+    
+    await update.message.reply_text("Caches cleared! Next answers will be fresh 🧹✨")
+
+_SCHEDULER_LOCK = None  # held open for the process lifetime once acquired
+
+def acquire_scheduler_lock():
+    """Return True if this process should own the daily news schedule"""
+    global _SCHEDULER_LOCK
+    if fcntl is None or _SCHEDULER_LOCK is not None:
+        return True
+    
+    try:
+        lock_file = open(CONFIG.scheduler_lock_file, 'w')
+    except OSError as e:
+        logger.warning("Could not open scheduler lock %s (%s); not coordinating with other processes",
+                       CONFIG.scheduler_lock_file, e)
+        return True
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False
+    _SCHEDULER_LOCK = lock_file
+    return True
+
 def setup_daily_news(application: Application):
     """Setup daily news job"""
-    ist = pytz.timezone('Asia/Kolkata')
+    # Every process schedules the jobs; the lock is taken when they fire (see prepare/send),
+    # so a process started during an overlapping deploy takes over once the old one exits
     
-    # Schedule for 7:00 AM IST every day
+    # The job queue takes the timezone from the times themselves
+    application.job_queue.run_daily(
+        prepare_daily_news,
+        time=NEWS_PREPARE_TIME,
+        days=(0, 1, 2, 3, 4, 5, 6),
+        name="prepare_daily_news",
+        job_kwargs={**NEWS_JOB_KWARGS, 'id': "prepare_daily_news"}
+    )
     application.job_queue.run_daily(
         send_daily_news,
-        time=time(hour=7, minute=0),
+        time=NEWS_SEND_TIME,
         days=(0, 1, 2, 3, 4, 5, 6),
         name="daily_news",
-        job_kwargs={'timezone': ist}
+        job_kwargs={**NEWS_JOB_KWARGS, 'id': "daily_news"}
     )
     
     logger.info("Daily news scheduled for 7:00 AM IST (auto-sends to all groups)")
 
+async def post_init(application: Application):
+    """Create the shared HTTP clients, start the groups writer and the web server once the event loop is running"""
+    start_group_saver()
+    application.bot_data['http'] = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS)
+    # HTTP/2 lets concurrent chat replies share one multiplexed OpenRouter connection
+    application.bot_data['openrouter'] = httpx.AsyncClient(
+        http2=True,
+        headers=OPENROUTER_HEADERS,
+        limits=OPENROUTER_LIMITS
+    )
+    application.bot_data['web'] = start_web_server(application)
+    if not CONFIG.webhook_url:  # run_webhook installs its own handlers
+        # Application.stop() then lets in-flight updates and the daily broadcast finish
+        install_stop_signals(application.stop_running)
+
+async def post_shutdown(application: Application):
+    """Stop the web server, save pending group changes and close the shared HTTP clients"""
+    server = application.bot_data.pop('web', None)
+    if server:
+        server.stop()
+        await server.close_all_connections()
+    await stop_group_saver()
+    for key in ('http', 'openrouter'):
+        http = application.bot_data.pop(key, None)
+        if http:
+            await http.aclose()
+
+def _force_exit():
+    logger.error("Shutdown did not finish within %ds, exiting anyway", SHUTDOWN_TIMEOUT)
+    _LOG_LISTENER.stop()  # os._exit skips atexit
+    os._exit(1)
+
+def install_stop_signals(stop):
+    """Call stop() on SIGINT/SIGTERM, with a watchdog in case the graceful shutdown hangs"""
+    def on_signal():
+        watchdog = threading.Timer(SHUTDOWN_TIMEOUT, _force_exit)
+        watchdog.daemon = True
+        watchdog.start()
+        stop()
+    
+    loop = asyncio.get_running_loop()
+    try:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, on_signal)
+    except NotImplementedError:  # Windows event loops; Ctrl+C still stops the bot
+        pass
+
+async def run_webhook(application: Application):
+    """Receive updates pushed by Telegram on the shared web server until SIGINT/SIGTERM"""
+    stop = asyncio.Event()
+    install_stop_signals(stop.set)
+    
+    async with application:
+        try:
+            await application.post_init(application)
+            await application.bot.set_webhook(
+                url=f"{CONFIG.webhook_url.rstrip('/')}/{CONFIG.telegram_token}",
+                secret_token=CONFIG.webhook_secret,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=True
+            )
+            await application.start()
+            await stop.wait()
+        finally:
+            # Also runs when startup fails or the task is cancelled, so nothing is left open
+            if application.running:
+                await application.stop()
+            await application.post_shutdown(application)
+
+_STARTUP_BANNER = "\n".join([
+    "Bot is now running! Features:",
+    "✅ Responds to 'smooth' mentions",
+    "✅ On-demand news (ask 'smooth news')",
+    "✅ Auto daily news at 7 AM IST to all groups",
+    "✅ Auto-detects and remembers groups"
+])
+
 def main():
     """Start the bot"""
     logger.info("Starting Smooth Bot with Auto-Group Detection...")
     
     # Validate required environment variables
-    if not TELEGRAM_TOKEN:
+    if not CONFIG.telegram_token:
         logger.error("TELEGRAM_TOKEN not set!")
         return
-    if not OPENROUTER_API_KEY:
+    if not CONFIG.openrouter_api_key:
         logger.error("OPENROUTER_API_KEY not set!")
         return
-    if not NEWS_API_KEY:
+    if not CONFIG.news_api_key:
         logger.warning("NEWS_API_KEY not set! News feature will not work.")
     
-    # Start Flask server in background
-    flask_thread = Thread(target=run_flask, daemon=True)
-    flask_thread.start()
-    logger.info("Flask keep-alive server started on port 8000")
-    
     # Create application
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(CONFIG.telegram_token)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # Add handlers
     application.add_handler(MessageHandler(
-        filters.TEXT | filters.PHOTO | filters.CAPTION,
+        # New messages only, checked by the dispatcher instead of handle_message's early return
+        filters.UpdateType.MESSAGE & (filters.TEXT | filters.PHOTO | filters.CAPTION) & ~filters.COMMAND,
         handle_message
     ))
     application.add_handler(CommandHandler("groups", cmd_groups))
+    application.add_handler(CommandHandler("clearcache", cmd_clearcache))
     
     # Setup daily news scheduler
     setup_daily_news(application)
     
     # Load existing groups
     groups = load_groups()
-    logger.info(f"Loaded {len(groups)} registered groups")
+    logger.info("Loaded %d registered groups", len(groups))
     
     # Start bot
-    logger.info("Bot is now running! Features:")
-    logger.info("✅ Responds to 'smooth' mentions")
-    logger.info("✅ On-demand news (ask 'smooth news')")
-    logger.info("✅ Auto daily news at 7 AM IST to all groups")
-    logger.info("✅ Auto-detects and remembers groups")
-    application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+    logger.info(_STARTUP_BANNER)
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    
+    if CONFIG.webhook_url:
+        # Telegram pushes updates to our web server, which also answers keep-alive pings
+        logger.info("Receiving updates via webhook on port %d", CONFIG.port)
+        asyncio.run(run_webhook(application))
+    else:
+        application.run_polling(
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True,
+            stop_signals=None  # handled in post_init
+        )
 
 if __name__ == '__main__':
     main()